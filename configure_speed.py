@@ -20,12 +20,14 @@ CONFIGS = {
         "CONSENSUS_RESPONSE_TIMEOUT": 8,
         "VALUE_PROCESS_DELAY": 3.0,
         "START_CONSENSUS_DELAY": 4.0,
+        "CONSENSUS_RESEND_TIMEOUT": 5,
         
         # Eleição
         "BULLY_TIMEOUT": 6,
         "ELECTION_START_DELAY": 1.0,
         "LEADER_DEATH_DELAY": 0.5,
         "BULLY_POLL_INTERVAL": 0.2,
+        "ELECTION_PROBE_TIMEOUT": 7,
         
         # Liderança
         "LEADER_STARTUP_DELAY": 4,
@@ -46,7 +48,6 @@ CONFIGS = {
         
         # Outros
         "STARTUP_DELAY": 1.0,
-        "MAIN_LOOP_INTERVAL": 2,
         "LISTEN_TIMEOUT": 0.2,
         "STATUS_LOG_INTERVAL": 45
     },
@@ -56,12 +57,14 @@ CONFIGS = {
         "CONSENSUS_RESPONSE_TIMEOUT": 5,
         "VALUE_PROCESS_DELAY": 2.0,
         "START_CONSENSUS_DELAY": 2.5,
+        "CONSENSUS_RESEND_TIMEOUT": 3,
         
         # Eleição
         "BULLY_TIMEOUT": 4,
         "ELECTION_START_DELAY": 0.5,
         "LEADER_DEATH_DELAY": 0.3,
         "BULLY_POLL_INTERVAL": 0.15,
+        "ELECTION_PROBE_TIMEOUT": 5,
         
         # Liderança
         "LEADER_STARTUP_DELAY": 3,
@@ -82,7 +85,6 @@ CONFIGS = {
         
         # Outros
         "STARTUP_DELAY": 0.8,
-        "MAIN_LOOP_INTERVAL": 1.5,
         "LISTEN_TIMEOUT": 0.15,
         "STATUS_LOG_INTERVAL": 35
     },
@@ -92,12 +94,14 @@ CONFIGS = {
         "CONSENSUS_RESPONSE_TIMEOUT": 3,
         "VALUE_PROCESS_DELAY": 1.0,
         "START_CONSENSUS_DELAY": 1.5,
+        "CONSENSUS_RESEND_TIMEOUT": 2,
         
         # Eleição
         "BULLY_TIMEOUT": 3,
         "ELECTION_START_DELAY": 0.3,
         "LEADER_DEATH_DELAY": 0.1,
         "BULLY_POLL_INTERVAL": 0.1,
+        "ELECTION_PROBE_TIMEOUT": 4,
         
         # Liderança
         "LEADER_STARTUP_DELAY": 2,
@@ -118,7 +122,6 @@ CONFIGS = {
         
         # Outros
         "STARTUP_DELAY": 0.5,
-        "MAIN_LOOP_INTERVAL": 1,
         "LISTEN_TIMEOUT": 0.1,
         "STATUS_LOG_INTERVAL": 30
     },
@@ -128,12 +131,14 @@ CONFIGS = {
         "CONSENSUS_RESPONSE_TIMEOUT": 1.5,
         "VALUE_PROCESS_DELAY": 0.4,
         "START_CONSENSUS_DELAY": 0.6,
+        "CONSENSUS_RESEND_TIMEOUT": 1,
         
         # Eleição
         "BULLY_TIMEOUT": 2,
         "ELECTION_START_DELAY": 0.15,
         "LEADER_DEATH_DELAY": 0.05,
         "BULLY_POLL_INTERVAL": 0.05,
+        "ELECTION_PROBE_TIMEOUT": 3,
         
         # Liderança
         "LEADER_STARTUP_DELAY": 1,
@@ -154,7 +159,6 @@ CONFIGS = {
         
         # Outros
         "STARTUP_DELAY": 0.3,
-        "MAIN_LOOP_INTERVAL": 0.5,
         "LISTEN_TIMEOUT": 0.05,
         "STATUS_LOG_INTERVAL": 20
     }
@@ -179,10 +183,22 @@ def validate_config(config):
         print("⚠️  AVISO: CONSENSUS_RESPONSE_TIMEOUT deve ser < CONSENSUS_INTERVAL")
         return False
         
+    if config["CONSENSUS_RESPONSE_TIMEOUT"] + config["CONSENSUS_RESEND_TIMEOUT"] >= config["CONSENSUS_INTERVAL"]:
+        print("⚠️  AVISO: CONSENSUS_RESPONSE_TIMEOUT + CONSENSUS_RESEND_TIMEOUT deve ser < CONSENSUS_INTERVAL")
+        return False
+        
+    if config["CONSENSUS_RESEND_TIMEOUT"] <= config["START_CONSENSUS_DELAY"]:
+        print("⚠️  AVISO: CONSENSUS_RESEND_TIMEOUT deve ser > START_CONSENSUS_DELAY")
+        return False
+        
     if config["BULLY_TIMEOUT"] <= config["ELECTION_START_DELAY"]:
         print("⚠️  AVISO: BULLY_TIMEOUT deve ser > ELECTION_START_DELAY")
         return False
         
+    if config["ELECTION_PROBE_TIMEOUT"] <= config["BULLY_TIMEOUT"]:
+        print("⚠️  AVISO: ELECTION_PROBE_TIMEOUT deve ser > BULLY_TIMEOUT")
+        return False
+        
     if config["VALUE_PROCESS_DELAY"] >= config["CONSENSUS_RESPONSE_TIMEOUT"]:
         print("⚠️  AVISO: VALUE_PROCESS_DELAY deve ser < CONSENSUS_RESPONSE_TIMEOUT")
         return False
@@ -261,12 +277,14 @@ def get_description(key):
         "CONSENSUS_RESPONSE_TIMEOUT": "Timeout para processar respostas de consenso",
         "VALUE_PROCESS_DELAY": "Delay para processar valores recebidos",
         "START_CONSENSUS_DELAY": "Delay para processar valores no START_CONSENSUS",
+        "CONSENSUS_RESEND_TIMEOUT": "Espera extra após pedir reenvio de VALUE/RESPONSE faltantes",
         
         # Eleição
         "BULLY_TIMEOUT": "Timeout para aguardar resposta na eleição",
         "ELECTION_START_DELAY": "Delay para iniciar eleição após receber ELECTION",
         "LEADER_DEATH_DELAY": "Delay para iniciar eleição após líder morrer",
         "BULLY_POLL_INTERVAL": "Intervalo de polling no algoritmo bully",
+        "ELECTION_PROBE_TIMEOUT": "Timeout para o processo de maior PID assumir antes do bully completo",
         
         # Liderança
         "LEADER_STARTUP_DELAY": "Delay para iniciar consenso após virar líder",
@@ -287,8 +305,7 @@ def get_description(key):
         
         # Outros
         "STARTUP_DELAY": "Delay inicial ao iniciar processo",
-        "MAIN_LOOP_INTERVAL": "Intervalo do loop principal",
-        "LISTEN_TIMEOUT": "Timeout para recepção de mensagens",
+        "LISTEN_TIMEOUT": "Espera após falha na recepção de mensagens",
         "STATUS_LOG_INTERVAL": "Intervalo para log de status"
     }
     return descriptions.get(key, "")
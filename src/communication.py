@@ -1,60 +1,114 @@
-import socket, struct
+import selectors, socket, struct
 import time
-from .config import MULTICAST_GRP, MULTICAST_PORT, NETWORK_RETRY_DELAY
+from .config import MULTICAST_GRP, MULTICAST_PORT, MULTICAST_TTL, NETWORK_RETRY_DELAY, RECV_BATCH, RECV_BUFFER_SIZE, RECV_TIMEOUT
+
+MULTICAST_ADDR = (MULTICAST_GRP, MULTICAST_PORT)
+MAX_DATAGRAM = 65535  # maior payload UDP: um datagrama maior que o buffer seria truncado
 
 def create_socket() -> socket.socket:
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Um único leitor por processo: fila maior no kernel absorve rajadas sem descartes
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)
     sock.bind(("", MULTICAST_PORT))
     mreq = struct.pack("=4sl", socket.inet_aton(MULTICAST_GRP), socket.INADDR_ANY)
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
     return sock
 
-def safe_create_socket() -> socket.socket:
+def create_unicast_socket() -> socket.socket:
+    # Porta efêmera própria: vários processos no mesmo host compartilham a porta
+    # multicast, então unicast para ela não chegaria ao processo certo
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)
+    # Todo envio sai por aqui: um broadcast é um único sendto ao grupo, e o loopback
+    # entrega a cópia aos processos do mesmo host (sem depender do padrão do sistema)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    sock.bind(("", 0))
+    return sock
+
+def safe_create_socket(factory=create_socket) -> socket.socket:
     while True:
         try:
-            return create_socket()
+            return factory()
         except Exception as e:
             time.sleep(NETWORK_RETRY_DELAY)
 
-def send(sock: socket.socket, data: bytes) -> bool:
+def send(sock: socket.socket, data: bytes, addr: tuple = MULTICAST_ADDR) -> bool:
     try:
-        sock.sendto(data, (MULTICAST_GRP, MULTICAST_PORT))
+        sock.sendto(data, addr)
         return True
     except Exception as e:
         return False
 
-def receive(sock: socket.socket, buffer_size: int = 1024) -> tuple[bytes, tuple] | None:
+def drain(sock: socket.socket, buf: memoryview, limit: int) -> list[tuple[bytes, tuple]] | None:
+    # Lê o que houver na fila sem bloquear, inclusive a primeira leitura: um select
+    # pronto espúrio (ex.: datagrama descartado por checksum) só devolve uma leva vazia.
+    # Cada datagrama é lido no mesmo buffer e copiado só com o seu tamanho real,
+    # em vez de alocar (e encolher) um bytes de MAX_DATAGRAM por recvfrom
+    packets = []
     try:
-        return sock.recvfrom(buffer_size)
+        while len(packets) < limit:
+            size, addr = sock.recvfrom_into(buf, 0, socket.MSG_DONTWAIT)
+            packets.append((bytes(buf[:size]), addr))
+    except BlockingIOError:
+        pass
     except Exception as e:
         return None
+    return packets
 
 class NetworkManager:
+    """
+    Recebe pelo socket multicast e por um socket unicast próprio; envia sempre
+    pelo unicast, de modo que o endereço de origem visto pelos outros processos
+    é o desse socket. Mensagens com destinatário conhecido vão direto a ele.
+    """
+
     def __init__(self):
         self.sock = None
+        self.usock = None
+        self.selector = None
+        self.peers = {}
         self.connected = False
+        self.closed = False
+        self.on_change = None  # chamado após cada tentativa de (re)conexão
+        self.rx_buf = memoryview(bytearray(MAX_DATAGRAM))  # só a thread de listen() recebe
         self._reconnect()
     
     def _reconnect(self):
         try:
-            if self.sock:
-                self.sock.close()
+            self._close_sockets()
             self.sock = safe_create_socket()
+            self.usock = safe_create_socket(create_unicast_socket)
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.sock, selectors.EVENT_READ)
+            self.selector.register(self.usock, selectors.EVENT_READ)
             self.connected = True
             print("[REDE] Conectado à rede")
         except Exception as e:
             self.connected = False
             print(f"[REDE] Falha na conexão: {e}")
+        if self.on_change:
+            self.on_change()
     
-    def send(self, data: bytes) -> bool:
+    def learn(self, pid: int, addr: tuple):
+        self.peers[pid] = addr
+    
+    def forget(self, pid: int):
+        self.peers.pop(pid, None)
+    
+    def send(self, data: bytes, to: int | None = None) -> bool:
+        if self.closed:
+            return False
+            
         if not self.connected:
             self._reconnect()
             
         if not self.connected:
             return False
             
-        success = send(self.sock, data)
+        addr = self.peers.get(to, MULTICAST_ADDR) if to is not None else MULTICAST_ADDR
+        success = send(self.usock, data, addr)
         
         if not success:
             print("Conexão perdida. Tentando reconectar...")
@@ -62,29 +116,58 @@ class NetworkManager:
             self._reconnect()
             
             if self.connected:
-                return send(self.sock, data)
+                return send(self.usock, data, addr)
         
         return success
     
-    def receive(self, buffer_size: int = 1024) -> tuple[bytes, tuple] | None:
+    def receive(self) -> list[tuple[bytes, tuple]] | None:
+        if self.closed:
+            return None
+            
         if not self.connected:
             self._reconnect()
             
         if not self.connected:
             return None
             
-        result = receive(self.sock, buffer_size)
+        try:
+            events = self.selector.select(RECV_TIMEOUT)
+        except Exception as e:
+            events = None
+            
+        if events == []:
+            # Nada chegou no intervalo: não é falha de conexão
+            return []
+            
+        # Uma rajada (ex.: VALUE de todos os processos) é lida inteira por acordada
+        result = [] if events else None
+        for key, _ in events or ():
+            packets = drain(key.fileobj, self.rx_buf, RECV_BATCH)
+            if packets is None:
+                result = None
+                break
+            result += packets
         
-        if result is None:
+        # close() de outra thread interrompe o select: encerramento, não perda de conexão
+        if result is None and not self.closed:
             print("Conexão perdida. Tentando reconectar...")
             self.connected = False
             self._reconnect()
         
         return result
     
+    def _close_sockets(self):
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+        for sock in (self.sock, self.usock):
+            if sock:
+                sock.close()
+        self.sock = None
+        self.usock = None
+    
     def close(self):
-        if self.sock:
-            self.sock.close()
-            self.sock = None
+        self.closed = True
+        self._close_sockets()
         self.connected = False
 
@@ -8,29 +8,46 @@ incluindo configurações de rede, timeouts e intervalos para diferentes operaç
 # Configurações de rede multicast
 MULTICAST_GRP  = "224.1.1.1"  # Endereço IP do grupo multicast
 MULTICAST_PORT = 50000         # Porta para comunicação multicast
+MULTICAST_TTL  = 1             # Saltos de roteador que um broadcast atravessa (1 = só a rede local)
 
 # Timeouts básicos do sistema
 HEARTBEAT_INT   = 0.3      # Intervalo entre heartbeats 
 FAIL_TIMEOUT    = 4        # Timeout para considerar processo morto
 HELLO_TIMEOUT   = 2        # Timeout para aguardar HELLO_ACK
+HELLO_ACK_DELAY = 0.005    # Janela do líder para responder vários HELLO em um único datagrama
 BULLY_TIMEOUT   = 3        # Timeout para aguardar resposta na eleição
 ROUND_START     = 0        # Round inicial do sistema
+ROUND_HISTORY   = 8        # Número máximo de rounds mantidos em memória
+MAX_FUTURE_ROUNDS = 8      # Rounds à frente do atual aceitos em VALUE/RESPONSE/START_CONSENSUS
+MAX_PAST_ROUNDS   = 8      # Rounds atrás do atual aceitos em VALUE/RESPONSE/START_CONSENSUS
+MAX_PEERS         = 64     # Máximo de remetentes distintos registrados por round
 
 # Timeouts do protocolo de consenso
 CONSENSUS_INTERVAL = 8              # Intervalo entre rodadas de consenso
+CONSENSUS_BATCH = 1                 # Rounds iniciados juntos a cada intervalo (no máximo min(ROUND_HISTORY, MAX_FUTURE_ROUNDS + 1))
 CONSENSUS_RESPONSE_TIMEOUT = 3      # Timeout para processar respostas de consenso
 VALUE_PROCESS_DELAY = 1.0           # Delay para processar valores recebidos
 START_CONSENSUS_DELAY = 1.5         # Delay para processar valores no START_CONSENSUS
+CONSENSUS_RESEND_TIMEOUT = 2        # Espera extra após pedir reenvio de VALUE/RESPONSE faltantes
+
+# Um lote maior que ROUND_HISTORY faria round_state() descartar o round atual ainda aberto,
+# e além de MAX_FUTURE_ROUNDS os seguidores recusariam os últimos rounds do lote
+if not 1 <= CONSENSUS_BATCH <= min(ROUND_HISTORY, MAX_FUTURE_ROUNDS + 1):
+    raise ValueError(f"CONSENSUS_BATCH deve estar entre 1 e min(ROUND_HISTORY, MAX_FUTURE_ROUNDS + 1), não {CONSENSUS_BATCH}")
 
 # Timeouts de eleição
-ELECTION_TIMEOUT = 2.0          # Timeout geral de eleição
 ELECTION_START_DELAY = 0.5      # Delay para iniciar eleição após receber ELECTION
 ROUND_CONSENSUS_TIMEOUT = 1.0   # Timeout para coletar votos de round
 LEADER_DEATH_DELAY = 0.1        # Delay para iniciar eleição após líder morrer
 BULLY_POLL_INTERVAL = 0.1       # Intervalo de polling no algoritmo bully
+ELECTION_PROBE_TIMEOUT = 4      # Timeout para o processo de maior PID assumir antes do bully completo
+
+# Timeouts ajustados pelo RTT medido (HELLO/HELLO_ACK, ELECTION/OK, ROUND_REQUEST/ROUND_RESPONSE): os valores fixos viram o mínimo
+RTT_EWMA_ALPHA      = 0.125     # Peso de cada nova amostra na média móvel do RTT
+ELECTION_RTT_FACTOR = 10        # BULLY_TIMEOUT e ELECTION_PROBE_TIMEOUT efetivos: no mínimo esse múltiplo do RTT
+ELECTION_JITTER     = 0.5       # Variação aleatória (fração, para mais ou para menos) de LEADER_DEATH_DELAY e ELECTION_START_DELAY
 
 # Timeouts de liderança
-LEADER_TIMEOUT = 3.0            # Timeout para considerar líder morto
 LEADER_STARTUP_DELAY = 2        # Delay para iniciar consenso após virar líder
 
 # Timeouts de monitoramento
@@ -42,10 +59,23 @@ NETWORK_RETRY_DELAY = 2         # Delay entre tentativas de reconexão
 NETWORK_LOG_INTERVAL = 10       # Intervalo para log de status de rede
 LEADER_SEARCH_INTERVAL = 3      # Intervalo para procurar líder
 LEADER_SEARCH_TIMEOUT = 10      # Timeout máximo para procurar líder antes de iniciar eleição
+LEADER_SEARCH_JITTER = 2        # Até esse tanto de segundos somado ao acaso ao LEADER_SEARCH_TIMEOUT de cada busca
 
 # Outros timeouts
 STARTUP_DELAY = 0.5             # Delay inicial ao iniciar processo
-MAIN_LOOP_INTERVAL = 1          # Intervalo do loop principal
-LISTEN_TIMEOUT = 0.1            # Timeout para recepção de mensagens
+LISTEN_TIMEOUT = 0.1            # Espera após falha na recepção de mensagens
+RECV_TIMEOUT = 1.0              # Timeout do recv bloqueante (responsividade ao encerrar)
+RECV_BATCH = 32                 # Máximo de datagramas lidos de um socket por acordada
+RECV_BUFFER_SIZE = 1 << 20      # SO_RCVBUF dos sockets (o kernel limita a net.core.rmem_max)
+TX_BATCH_DELAY = 0.002          # Espera para agrupar broadcasts de saída em um único BATCH
+TX_BATCH_MAX = 8                # Broadcasts na fila que disparam o envio imediato do BATCH
 STATUS_LOG_INTERVAL = 30        # Intervalo para log de status
 
+# Logs
+LOG_LEVEL = 1                   # 0 = silencioso, 1 = eventos do protocolo, 2 = também mensagens individuais
+LOG_FLUSH_INTERVAL = 0.2        # Intervalo para escrever o buffer de logs no stdout
+LOG_BUFFER_MAX = 10000          # Linhas pendentes no buffer além das quais novos logs são descartados
+LOG_STOP_TIMEOUT = 1.0          # Espera máxima pela descarga final do flusher ao encerrar
+
+# Geração de valores
+RANDOM_BATCH = 1024             # Valores sorteados de uma vez para o consenso
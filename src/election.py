@@ -1,18 +1,37 @@
-from threading import Event, Thread
 from time import monotonic, sleep
-from .message import pack, unpack
-from .config import BULLY_TIMEOUT, BULLY_POLL_INTERVAL
+from .config import BULLY_TIMEOUT, BULLY_POLL_INTERVAL, ELECTION_PROBE_TIMEOUT, ELECTION_RTT_FACTOR
+
+def probe_highest(node) -> bool:
+    # peer_pids já vem ordenado: o candidato é o primeiro vivo a partir do fim,
+    # ignorando quem passou do prazo mas ainda não foi removido pelo monitor
+    candidate = next((pid for pid in reversed(node.get_alive_pids()) if node.is_alive(pid)), None)
+    if candidate is None or candidate < node.pid:
+        return False
+        
+    node.log("[ELEIÇÃO] Consultando processo de maior PID %s", "yellow", candidate)
+    node.send("ELECT_HIGH", to=candidate, from_pid=node.pid)
+    
+    start_time = monotonic()
+    timeout = node.rtt_timeout(ELECTION_PROBE_TIMEOUT, ELECTION_RTT_FACTOR)
+    while monotonic() - start_time < timeout:
+        if node.leader is not None:
+            node.log("[ELEIÇÃO] Processo %s assumiu a liderança", "green", node.leader)
+            return True
+        sleep(BULLY_POLL_INTERVAL)
+        
+    node.log("[ELEIÇÃO] Processo %s não respondeu - recorrendo ao bully", "yellow", candidate)
+    return False
 
 def bully(node):
     node.log("[ELEIÇÃO] Iniciando eleição bully", "red")
     
     node.received_ok = False
     
-    node.send("ELECTION", source=node.pid)
+    node.send_probe(node.election_packet, "OK")
     node.log("[ELEIÇÃO] Enviado ELECTION para todos", "yellow")
 
     start_time = monotonic()
-    timeout = BULLY_TIMEOUT
+    timeout = node.rtt_timeout(BULLY_TIMEOUT, ELECTION_RTT_FACTOR)
     
     while monotonic() - start_time < timeout:
         if node.received_ok:
@@ -1,16 +1,14 @@
-from time import monotonic, sleep
+from time import monotonic
 from threading import Thread
-from .message import pack
 from .config import HEARTBEAT_INT, FAIL_TIMEOUT, MONITOR_INTERVAL, MONITOR_STARTUP_GRACE, LEADER_DEATH_DELAY
-import threading
 
 def start_heartbeat(node):
     def pulse():
-        while not node.shutdown:
-            success = node.network.send(pack("HB", pid=node.pid))
+        while not node.shutdown.is_set():
+            success = node.network.send(node.hb_packet)
             if not success:
                 node.log("[HEARTBEAT] Falha ao enviar - rede indisponível", "red")
-            sleep(HEARTBEAT_INT)
+            node.shutdown.wait(HEARTBEAT_INT)
 
     Thread(target=pulse, daemon=True).start()
 
@@ -18,37 +16,61 @@ def start_monitor(node):
     monitor_start_time = monotonic()
     
     def monitor():
-        while not node.shutdown:
+        while not node.shutdown.is_set():
+            delay = MONITOR_INTERVAL
             try:
                 now = monotonic()
                 
-                if now - monitor_start_time < MONITOR_STARTUP_GRACE:
-                    sleep(MONITOR_INTERVAL)
+                # Durante a carência não há o que verificar: dorme até o fim dela
+                grace_left = monitor_start_time + MONITOR_STARTUP_GRACE - now
+                if grace_left > 0:
+                    node.shutdown.wait(grace_left)
                     continue
                 
+                # Cada processo tem seu prazo (último sinal + FAIL_TIMEOUT); o monitor só
+                # precisa acordar de novo quando o prazo mais próximo vencer
+                deadline_of = node.deadlines.get
+                next_expiry = now + FAIL_TIMEOUT
                 to_remove = []
-                leader_died = False
                 
-                for pid, last_seen in list(node.alive.items()):
-                    if pid != node.pid and now - last_seen > FAIL_TIMEOUT:
-                        to_remove.append(pid)
-                        if pid == node.leader:
-                            leader_died = True
+                # Caso comum, ninguém vencido: um min() em C sobre os prazos basta, sem
+                # percorrer os pids em Python. O próprio HB (loopback) mantém o prazo
+                # deste processo em dia; se vencer, só cai na varredura completa abaixo.
+                # A thread de recepção insere em deadlines sem lock: tuple() tira a cópia
+                # em C de uma vez, sem iterar um dict que pode mudar de tamanho no meio.
+                earliest = min(tuple(node.deadlines.values()), default=next_expiry)
+                if earliest >= now:
+                    node.shutdown.wait(max(earliest - now, MONITOR_INTERVAL))
+                    continue
+                
+                with node.alive_lock:
+                    for pid in node.alive:
+                        if pid == node.pid:
+                            continue
+                        deadline = deadline_of(pid, 0)
+                        if deadline < now:
+                            to_remove.append(pid)
+                        elif deadline < next_expiry:
+                            next_expiry = deadline
+                    for pid in to_remove:
+                        node.forget_alive(pid)
+                        
+                delay = max(next_expiry - now, MONITOR_INTERVAL)
+                
+                leader_died = node.leader in to_remove
                 
                 for pid in to_remove:
-                    if pid in node.alive:
-                        del node.alive[pid]
-                        node.log(f"[MONITOR] Processo {pid} considerado morto", "red")
+                    node.log("[MONITOR] Processo %s considerado morto", "red", pid)
                 
-                if leader_died and not node.shutdown:
+                if leader_died and not node.shutdown.is_set():
                     node.log("[MONITOR] Líder caiu - iniciando eleição", "red")
-                    threading.Timer(LEADER_DEATH_DELAY, node.start_election).start()
+                    node.scheduler.schedule(node.jittered(LEADER_DEATH_DELAY), node.start_election_async)
                 
             except Exception as e:
-                if not node.shutdown:
-                    node.log(f"[MONITOR] Erro: {e}", "red")
+                if not node.shutdown.is_set():
+                    node.log("[MONITOR] Erro: %s", "red", e)
             
-            sleep(MONITOR_INTERVAL)
+            node.shutdown.wait(delay)
 
     Thread(target=monitor, daemon=True).start()
 
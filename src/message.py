@@ -1,10 +1,104 @@
-import json
+import struct
+from collections import namedtuple
+from operator import itemgetter
 from typing import Any
 
-def pack(op: str, **kwargs: Any) -> bytes:
-    payload = {"op": op, **kwargs}
-    return json.dumps(payload).encode()
+OPS = (
+    "HELLO", "HELLO_ACK", "HB", "ELECTION", "OK", "LEADER",
+    "START_CONSENSUS", "VALUE", "RESPONSE",
+    "ROUND_UPDATE", "ROUND_REQUEST", "ROUND_RESPONSE",
+    "ELECT_HIGH", "RESEND", "BATCH",
+)
+OP_CODES = {op: code for code, op in enumerate(OPS)}
 
-def unpack(data: bytes) -> dict[str, Any]:
-    return json.loads(data.decode())
+# Cabeçalho: código da operação + destinatário (BROADCAST quando não há "to")
+HEADER = struct.Struct("!Bq")
+BROADCAST = -(1 << 63)
 
+Message = namedtuple(
+    "Message",
+    ["op", "pid", "round", "value", "response", "to", "source", "from_pid"],
+    defaults=(None,) * 7,
+)
+
+# Campos do corpo de cada operação, todos inteiros de 64 bits após o cabeçalho
+FIELDS = {
+    "HELLO": ("pid",),
+    "HELLO_ACK": ("pid", "round"),
+    "HB": ("pid",),
+    "ELECTION": ("source",),
+    "OK": (),
+    "LEADER": ("pid", "round"),
+    "START_CONSENSUS": ("round",),
+    "VALUE": ("pid", "value", "round"),
+    "RESPONSE": ("pid", "response", "round"),
+    "ROUND_UPDATE": ("round",),
+    "ROUND_REQUEST": ("from_pid",),
+    "ROUND_RESPONSE": ("pid", "round"),
+    "ELECT_HIGH": ("from_pid",),
+    "RESEND": ("round",),
+    "BATCH": (),  # corpo: mensagens já empacotadas, concatenadas
+}
+FORMATS = [struct.Struct(HEADER.format + "q" * len(FIELDS[op])) for op in OPS]
+SIZES = [fmt.size for fmt in FORMATS]
+
+def _getters(op: str) -> tuple:
+    # Monta o Message direto da tupla do struct (+ nome da operação e None) com um
+    # itemgetter por operação, sem laço Python; um para broadcast e outro com "to"
+    fields = FIELDS[op]
+    op_index, none_index = 2 + len(fields), 3 + len(fields)
+    def getter(to_index):
+        return itemgetter(*(
+            op_index if name == "op" else
+            to_index if name == "to" else
+            2 + fields.index(name) if name in fields else none_index
+            for name in Message._fields
+        ))
+    return getter(1), getter(none_index)
+
+GETTERS = [_getters(op) for op in OPS]
+EXTRAS = [(op, None) for op in OPS]
+def _body_getter(fields: tuple):
+    # Tira os campos do corpo dos kwargs em ordem; itemgetter só devolve tupla com 2+ campos
+    if len(fields) > 1:
+        return itemgetter(*fields)
+    if fields:
+        get = itemgetter(fields[0])
+        return lambda kwargs: (get(kwargs),)
+    return lambda kwargs: ()
+
+# Por nome da operação: código, pack já ligado do struct e extrator do corpo
+PACKERS = {op: (code, FORMATS[code].pack, _body_getter(FIELDS[op])) for code, op in enumerate(OPS)}
+BATCH_HEADER = HEADER.pack(OP_CODES["BATCH"], BROADCAST)  # sempre igual: montado uma vez
+
+def pack(op: str, to: int | None = None, **kwargs: Any) -> bytes:
+    code, pack_body, body = PACKERS[op]
+    return pack_body(code, BROADCAST if to is None else to, *body(kwargs))
+
+def pack_batch(packets: list[bytes]) -> bytes:
+    # Cada mensagem tem tamanho fixo pelo seu código, então basta concatenar
+    return BATCH_HEADER + b"".join(packets)
+
+def split_batch(data: bytes) -> list[bytes]:
+    packets = []
+    offset = HEADER.size
+    while offset < len(data):
+        if data[offset] >= len(SIZES):
+            break
+        size = SIZES[data[offset]]
+        packets.append(data[offset:offset + size])
+        offset += size
+    return packets
+
+def well_formed(data: bytes) -> bool:
+    # Código conhecido e bytes suficientes: outro tráfego na porta não derruba o listener
+    return bool(data) and data[0] < len(SIZES) and len(data) >= SIZES[data[0]]
+
+def recipient(data: bytes) -> int | None:
+    _, to = HEADER.unpack_from(data)
+    return None if to == BROADCAST else to
+
+def unpack(data: bytes) -> Message:
+    code = data[0]
+    values = FORMATS[code].unpack_from(data)
+    return Message._make(GETTERS[code][values[1] == BROADCAST](values + EXTRAS[code]))
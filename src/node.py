@@ -1,138 +1,452 @@
 #!/usr/bin/env python3
 
-import argparse, threading
-from time import monotonic, sleep
-from random import randint
-from collections import defaultdict
+import argparse, os, sys, threading
+from time import localtime, monotonic, strftime, time
+from random import Random, uniform
+from bisect import bisect_left, insort
+from collections import Counter
+from heapq import heappop, heappush
+from dataclasses import dataclass, field
 from .config import *
 from .communication import NetworkManager
-from .message import pack, unpack
+from .message import FORMATS, OPS, OP_CODES, pack, pack_batch, split_batch, unpack, recipient, well_formed
 from .failure_detection import start_heartbeat, start_monitor
-from .election import bully
+from .election import bully, probe_highest
+from .scheduler import Scheduler, ScheduledTask
+from .rwlock import RWLock
+
+COLORS = {
+    "red": "\033[91m",
+    "green": "\033[92m",
+    "yellow": "\033[93m",
+    "blue": "\033[94m",
+    "purple": "\033[95m",
+    "cyan": "\033[96m",
+}
+RESET = "\033[0m"
+
+RANDOM_RANGE = range(1, 11)
+
+BATCH_CODE = OP_CODES["BATCH"]
+HB_CODE = OP_CODES["HB"]
+HB_TAG = bytes((HB_CODE,))  # primeiro byte de todo HB; data[:1] não falha com datagrama vazio
+HB_FORMAT = FORMATS[HB_CODE]
+
+def majority(votes: list) -> tuple:
+    # Caso comum: quase todos concordam e o primeiro voto já é a maioria absoluta,
+    # confirmada com list.count (em C). Senão, contagem completa (pluralidade).
+    # Substitui o Boyer-Moore: as duas passadas dele rodam no interpretador e, com
+    # dezenas de votos, custam mais que list.count + Counter, ambos em C.
+    # Resultado e desempate (primeiro visto) são os mesmos.
+    if votes:
+        support = votes.count(votes[0])
+        if support * 2 > len(votes):
+            return votes[0], support
+    return Counter(votes).most_common(1)[0]
+
+@dataclass
+class RoundState:
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    values: dict = field(default_factory=dict)
+    max_value: int | None = None
+    responses: dict = field(default_factory=dict)
+    tally: Counter = field(default_factory=Counter)
+    response_sent: int | None = None
+    resent: bool = False
+    result: int | None = None
+    finalize: ScheduledTask | None = None
+    timer: ScheduledTask | None = None
+
+    def record_value(self, pid: int, value: int):
+        # Máximo mantido a cada VALUE: process_maximum_value não percorre nem copia os valores
+        old = self.values.get(pid)
+        self.values[pid] = value
+        if self.max_value is None or value > self.max_value:
+            self.max_value = value
+        elif old == self.max_value and value < old:
+            self.max_value = max(self.values.values())
+
+    def reset_values(self, pid: int, value: int):
+        self.values = {pid: value}
+        self.max_value = value
+
+    def record_response(self, pid: int, response: int):
+        # Mantém a contagem incremental: uma resposta repetida do mesmo processo troca o voto
+        old = self.responses.get(pid)
+        if old is not None:
+            self.tally[old] -= 1
+            if not self.tally[old]:
+                del self.tally[old]
+        self.responses[pid] = response
+        self.tally[response] += 1
+
+    def decided(self, total: int) -> bool:
+        # Maioria estrita dos processos já concorda: as respostas restantes não mudam o resultado
+        # Só a maior contagem importa aqui: max() direto nos valores, sem montar pares (valor, votos)
+        return bool(self.tally) and max(self.tally.values()) * 2 > total
+
+    def cancel_timer(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
 
 class Node:
-    def __init__(self, pid: int):
+    """
+    Processo do sistema: eleição bully, consenso por rounds e detecção de falhas.
+
+    leader, round e in_election são lidos sem lock (leitura de um atributo é
+    atômica sob o GIL); toda transição é feita sob o lock do grupo. in_election
+    vira True antes do ELECTION ser enviado e volta a False sob o writer, então
+    uma leitura desatualizada só atrasa a decisão até a próxima verificação.
+    """
+
+    def __init__(self, pid: int, log_level: int = LOG_LEVEL, color: bool | None = None, seed: int | None = None):
         self.pid = pid
+        self.log_level = log_level
+        self.verbose = log_level >= 2  # linhas por mensagem recebida: testado antes de chamar log()
+        # Por padrão só colore quando a saída é um terminal
+        self.colors = COLORS if (sys.stdout.isatty() if color is None else color) else {}
+        # Trechos fixos de cada linha por (cor, sou líder): só o horário e a mensagem variam
+        self.log_parts = {
+            (name, leading): (f" [PID {pid}] {code}{'♔ ' if leading else '○ '}", f"{RESET}\n" if code else "\n")
+            for name, code in [("", ""), *self.colors.items()]
+            for leading in (False, True)
+        }
+        self.log_buf = []
+        self.log_dropped = 0
+        self.ts = (None, "")  # último (segundo, "[HH:MM:SS]") formatado por flush_log
+        # Com semente, a sequência de valores de cada nó se repete entre execuções (depuração);
+        # o pid entra na semente para nós diferentes não sortearem as mesmas posições
+        self.rng = Random(None if seed is None else f"{seed}:{pid}")
+        self.value_choices = [i * i * pid for i in RANDOM_RANGE]  # valores possíveis deste processo
+        self.rand_buf = []
         self.network = NetworkManager()
+        self.scheduler = Scheduler()
+        # Mensagens que só dependem do pid: empacotadas uma única vez
+        self.hello_packet = pack("HELLO", pid=pid)
+        self.hb_packet = pack("HB", pid=pid)
+        self.election_packet = pack("ELECTION", source=pid)
+        self.round_request_packet = pack("ROUND_REQUEST", from_pid=pid)
+        self.tx_lock = threading.Lock()         # tx_queue, tx_task, pending_acks
+        self.tx_queue = []
+        self.tx_task = None
+        self.pending_acks = set()
         
-        self.state_lock = threading.RLock()
+        # Locks por grupo de estado (ordem de aquisição: election -> consensus -> RoundState.lock -> alive)
+        self.election_lock = RWLock()           # leader, in_election (received_ok só tem escritas simples, sem lock)
+        self.consensus_lock = threading.Lock()  # round e o dicionário rounds (campos de cada round: RoundState.lock)
+        self.alive_lock = threading.Lock()      # alive, alive_sorted, peer_pids
+        self.election_spawn = threading.Lock()  # livre quando não há thread de eleição rodando
         self.round = ROUND_START
         self.leader = None
-        self.alive = {pid: monotonic()}
+        self.alive = {pid}
+        self.deadlines = {pid: monotonic() + FAIL_TIMEOUT}  # escrito sem lock (ver mark_alive)
+        self.alive_sorted = [pid]
+        self.peer_pids = ()                     # alive_sorted sem o próprio pid, refeito só quando muda
         
         self.in_election = False
         self.received_ok = False
+        self.elections = 0                      # eleições concluídas e tempo total gasto nelas
+        self.election_time = 0.0
+        
+        self.election_seen = 0.0                # último ELECTION recebido de um processo maior
+        self.rtt = 0.0                          # média móvel do RTT até os pares (0 = sem amostra)
+        self.rtt_probes = {}                    # resposta esperada -> instante do pedido (HELLO_ACK, ROUND_RESPONSE, OK)
         
         self.round_votes = {}
         self.round_consensus_timer = None
         
-        self.values_received = {}
-        self.responses_received = {}
-        self.responses_sent = {}
-        self.value_timers = {}
+        self.rounds = {}
+        self.round_heap = []                    # números dos rounds em self.rounds, menor no topo
         
         self.consensus_timer = None
         self.was_connected = True
-        self.shutdown = False
-        
-        self.log(f"Nó {self.pid} criado com sucesso", "green")
-
-    def log(self, msg: str, color: str = ""):
-        colors = {
-            "red": "\033[91m",
-            "green": "\033[92m",
-            "yellow": "\033[93m",
-            "blue": "\033[94m",
-            "purple": "\033[95m",
-            "cyan": "\033[96m",
-            "reset": "\033[0m"
-        }
+        self.shutdown = threading.Event()
+        self.state_changed = threading.Event()  # acorda run() quando líder ou conexão mudam
+        self.network.on_change = self.state_changed.set
+        # Tabela indexada pelo código da operação; HB e BATCH são tratados em handle() antes
+        self.handlers = tuple(None if op in ("HB", "BATCH") else getattr(self, f"on_{op.lower()}") for op in OPS)
+        self.log_thread = threading.Thread(target=self.log_flusher, daemon=True)
+        self.log_thread.start()
         
-        color_code = colors.get(color, "")
-        reset_code = colors["reset"]
+        self.log("Nó %s criado com sucesso", "green", self.pid)
+
+    def log(self, msg: str, color: str = "", *args, level: int = 1):
+        # Argumentos no estilo %s só são formatados se o nível estiver habilitado
+        if level > self.log_level:
+            return
+        if args:
+            msg = msg % args
         
-        import time
-        timestamp = time.strftime("%H:%M:%S")
-        prefix = "♔ " if self.leader == self.pid else "○ "
-        print(f"[{timestamp}] [PID {self.pid}] {color_code}{prefix}{msg}{reset_code}", flush=True)
+        # Só o instante é guardado aqui; o horário é formatado por flush_log
+        leading = self.leader == self.pid
+        head, tail = self.log_parts.get((color, leading)) or self.log_parts["", leading]
+        if len(self.log_buf) >= LOG_BUFFER_MAX:
+            # stdout travado (ex.: pipe cheio) não pode segurar quem loga nem crescer sem limite;
+            # a contagem é aproximada (incremento sem lock)
+            self.log_dropped += 1
+            return
+        self.log_buf.append((time(), head, msg, tail))
+
+    def flush_log(self):
+        # Troca o buffer inteiro de uma vez: append concorrente vai para a lista nova
+        buf, self.log_buf = self.log_buf, []
+        dropped, self.log_dropped = self.log_dropped, 0
+        if dropped:
+            head, tail = self.log_parts.get(("red", False)) or self.log_parts["", False]
+            buf.append((time(), head, f"[LOG] {dropped} linhas descartadas (buffer cheio)", tail))
+        if not buf:
+            return
+            
+        # strftime uma vez por segundo distinto do lote
+        sec, stamp = self.ts
+        lines = []
+        for when, head, msg, tail in buf:
+            if int(when) != sec:
+                sec = int(when)
+                stamp = strftime("[%H:%M:%S]", localtime(sec))
+            lines.append(f"{stamp}{head}{msg}{tail}")
+        self.ts = (sec, stamp)
+        sys.stdout.write("".join(lines))
+        sys.stdout.flush()
+
+    def log_flusher(self):
+        while not self.shutdown.wait(LOG_FLUSH_INTERVAL):
+            self.flush_log()
+        self.flush_log()
 
     def send(self, op: str, **kv):
+        return self.send_packet(pack(op, **kv), kv.get("to"))
+
+    def send_packet(self, data: bytes, to: int | None = None):
         if not self.network.connected:
             return False
             
-        return self.network.send(pack(op, **kv))
+        if to is not None:
+            # Esvazia a fila antes para não inverter a ordem em relação aos broadcasts
+            self.flush_tx()
+            return self.network.send(data, to)
+            
+        # Broadcasts esperam até TX_BATCH_DELAY para sair juntos em um único BATCH
+        with self.tx_lock:
+            self.tx_queue.append(data)
+            if len(self.tx_queue) < TX_BATCH_MAX:
+                if self.tx_task is None:
+                    self.tx_task = self.scheduler.schedule(TX_BATCH_DELAY, self.flush_tx)
+                return True
+        return self.flush_tx()
 
-    def get_alive_pids(self):
-        return [pid for pid in self.alive.keys() if pid != self.pid]
+    def send_batch(self, *messages: tuple):
+        # Várias mensagens de broadcast em um único datagrama: [(op, kwargs), ...]
+        if not self.network.connected:
+            return False
+            
+        with self.tx_lock:
+            self.tx_queue.extend(pack(op, **kv) for op, kv in messages)
+        return self.flush_tx()
+
+    def flush_tx(self):
+        with self.tx_lock:
+            queue, self.tx_queue = self.tx_queue, []
+            if self.tx_task:
+                self.tx_task.cancel()
+                self.tx_task = None
+        if not queue:
+            return True
+        return self.network.send(queue[0] if len(queue) == 1 else pack_batch(queue))
+
+    def round_state(self, round_num: int) -> RoundState:
+        state = self.rounds.get(round_num)
+        if state is None:
+            state = self.rounds[round_num] = RoundState()
+            heappush(self.round_heap, round_num)
+            # Rounds futuros podem chegar antes dos atuais: descarta pelo número, não pela chegada
+            while len(self.rounds) > ROUND_HISTORY:
+                self.rounds.pop(heappop(self.round_heap)).cancel_timer()
+        return state
+
+    def window_state(self, round_num: int) -> RoundState | None:
+        with self.consensus_lock:
+            if not self.round_in_window(round_num):
+                return None
+            return self.round_state(round_num)
+
+    def round_in_window(self, round_num: int) -> bool:
+        return self.round - MAX_PAST_ROUNDS <= round_num <= self.round + MAX_FUTURE_ROUNDS
+
+    def discard_rounds_before(self, round_num: int) -> int:
+        discarded = 0
+        while self.round_heap and self.round_heap[0] < round_num:
+            self.rounds.pop(heappop(self.round_heap)).cancel_timer()
+            discarded += 1
+        return discarded
+
+    def discard_all_rounds(self):
+        for state in self.rounds.values():
+            state.cancel_timer()
+        self.rounds.clear()
+        self.round_heap.clear()
+
+    def mark_alive(self, pid: int, deadline: float | None = None) -> bool:
+        # Atribuição em dict e teste em set são atômicos sob o GIL: o caminho comum
+        # (HB de processo já conhecido) não precisa de lock. Só inserções o adquirem.
+        self.deadlines[pid] = deadline or monotonic() + FAIL_TIMEOUT
+        if pid in self.alive:
+            return False
+            
+        with self.alive_lock:
+            is_new = pid not in self.alive
+            if is_new:
+                self.alive.add(pid)
+                insort(self.alive_sorted, pid)
+                self.rebuild_peer_pids()
+        return is_new
+
+    def forget_alive(self, pid: int):
+        # Deve ser chamado com alive_lock adquirido
+        self.alive.discard(pid)
+        self.deadlines.pop(pid, None)
+        # Sem isso, peers cresceria com cada pid que já passou pelo grupo
+        self.network.forget(pid)
+        del self.alive_sorted[bisect_left(self.alive_sorted, pid)]
+        self.rebuild_peer_pids()
+
+    def rebuild_peer_pids(self):
+        # Deve ser chamado com alive_lock adquirido
+        pids = self.alive_sorted
+        i = bisect_left(pids, self.pid)
+        self.peer_pids = tuple(pids[:i] + pids[i + 1:])
+
+    def is_alive(self, pid: int) -> bool:
+        return monotonic() < self.deadlines.get(pid, 0)
+
+    def get_alive_pids(self) -> tuple:
+        # Tupla imutável trocada atomicamente: leitura sem lock nem cópia
+        return self.peer_pids
     
     def calculate_current_value(self):
-        i = randint(1, 10)
-        return i * i * self.pid
+        # Sorteia em lote já sobre os valores finais; chamado sempre com consensus_lock adquirido
+        if not self.rand_buf:
+            self.rand_buf = self.rng.choices(self.value_choices, k=RANDOM_BATCH)
+        return self.rand_buf.pop()
 
-    def schedule_next_consensus(self):
+    def schedule_next_consensus(self, started: float):
         if self.leader != self.pid:
             return
             
         if self.consensus_timer:
             self.consensus_timer.cancel()
             
-        self.consensus_timer = threading.Timer(CONSENSUS_INTERVAL, self.start_consensus_round)
-        self.consensus_timer.start()
+        # Conta do início do round anterior: o tempo gasto para iniciá-lo não desloca os seguintes
+        self.consensus_timer = self.scheduler.schedule_at(started + CONSENSUS_INTERVAL, self.start_consensus_round)
 
     def start_consensus_round(self):
+        started = monotonic()
         if not self.network.connected:
-            self.schedule_next_consensus()
+            self.schedule_next_consensus(started)
             return
             
-        with self.state_lock:
-            if self.pid != self.leader:
-                return
-            
-            alive_pids = self.get_alive_pids()
-            self.log(f"[LÍDER] Iniciando consenso round {self.round} - Processos vivos: {[self.pid] + alive_pids}", "green")
-            self.values_received[self.round] = {}
-            self.responses_received[self.round] = {}
-            
-            my_value = self.calculate_current_value()
-            self.values_received[self.round][self.pid] = my_value
-            self.log(f"[LÍDER] Meu valor: {my_value}", "green")
+        if self.pid != self.leader:
+            return
             
-            self.send("START_CONSENSUS", round=self.round)
+        alive_pids = self.get_alive_pids()
+        with self.consensus_lock:
+            # CONSENSUS_BATCH rounds por intervalo: os START_CONSENSUS saem em um único BATCH
+            # e VALUE/RESPONSE dos seguidores são agrupados pela fila de envio
+            rounds = range(self.round, self.round + CONSENSUS_BATCH)
+            self.log("[LÍDER] Iniciando consenso round %s - Processos vivos: %s", "green",
+                     self.round if len(rounds) == 1 else f"{rounds[0]}-{rounds[-1]}", [self.pid, *alive_pids])
+            for round_num in rounds:
+                state = self.round_state(round_num)
+                my_value = self.calculate_current_value()
+                with state.lock:
+                    state.reset_values(self.pid, my_value)
+                    state.responses = {}
+                    state.tally.clear()
+                    state.resent = False
+                    state.result = None
+                    state.finalize = self.scheduler.schedule(CONSENSUS_RESPONSE_TIMEOUT, self.process_consensus_responses, round_num)
+                self.log("[LÍDER] Meu valor: %s (round %s)", "green", my_value, round_num)
             
-        threading.Timer(CONSENSUS_RESPONSE_TIMEOUT, self.process_consensus_responses).start()
+            self.send_batch(*(("START_CONSENSUS", dict(round=round_num)) for round_num in rounds))
         
-        self.schedule_next_consensus()
+        self.schedule_next_consensus(started)
 
-    def process_consensus_responses(self):
-        with self.state_lock:
-            if self.pid != self.leader or self.round not in self.responses_received:
-                return
+    def process_consensus_responses(self, round_num: int):
+        if self.pid != self.leader:
+            return
             
-            responses = list(self.responses_received[self.round].values())
-            if not responses:
+        alive_pids = self.get_alive_pids()
+        with self.consensus_lock:
+            state = self.rounds.get(round_num)
+            if state is None or not self.round <= round_num < self.round + CONSENSUS_BATCH:
                 return
+                
+            with state.lock:
+                if state.result is not None:
+                    return
+                consensus_response = state.result = self.decide_round(state, round_num, alive_pids)
+            if consensus_response is None:
+                return
+                
+            # Rounds do mesmo lote podem decidir fora de ordem: avança pelos já decididos em sequência
+            old_round = self.round
+            while (decided := self.rounds.get(self.round)) is not None and decided.result is not None:
+                self.round += 1
+            if self.round == old_round:
+                return
+                
+            # Rounds que saíram da janela nunca mais são consultados (window_state os recusa):
+            # solta já o estado deles em vez de esperar a evicção por ROUND_HISTORY
+            self.discard_rounds_before(self.round - MAX_PAST_ROUNDS)
+            self.log("[LÍDER] Avançando para round %s", "green", self.round)
+            self.send("ROUND_UPDATE", round=self.round)
+
+    def decide_round(self, state: RoundState, round_num: int, alive_pids: list) -> int | None:
+        # Deve ser chamado com consensus_lock e state.lock adquiridos
+        # Chamado pelo timer ou antecipadamente ao atingir maioria: só decide uma vez
+        if state.finalize:
+            state.finalize.cancel()
+            state.finalize = None
             
-            responses_detail = {pid: resp for pid, resp in self.responses_received[self.round].items()}
-            self.log(f"[LÍDER] Respostas recebidas: {responses_detail}", "purple")
-            
-            response_counts = defaultdict(int)
-            for response in responses:
-                response_counts[response] += 1
-            
-            consensus_response = max(response_counts.items(), key=lambda x: x[1])[0]
-            votes_detail = dict(response_counts)
-            self.log(f"[VOTAÇÃO] Contagem: {votes_detail}", "purple")
-            self.log(f"[CONSENSO] Round {self.round}: Resposta = {consensus_response} (votos: {response_counts[consensus_response]})", "purple")
+        # Pacotes perdidos: pede uma única vez que o round seja reenviado antes de decidir
+        missing = [pid for pid in alive_pids if pid not in state.responses]
+        if missing and not state.resent and not state.decided(len(alive_pids) + 1):
+            state.resent = True
+            self.log("[LÍDER] Sem resposta de %s - pedindo reenvio do round %s", "yellow", missing, round_num)
+            self.send("RESEND", round=round_num)
+            state.finalize = self.scheduler.schedule(CONSENSUS_RESEND_TIMEOUT, self.process_consensus_responses, round_num)
+            return None
             
-            self.round += 1
-            self.log(f"[LÍDER] Avançando para round {self.round}", "green")
-            self.send("ROUND_UPDATE", round=self.round)
+        if not state.responses:
+            return None
+        
+        self.log("[LÍDER] Respostas recebidas: %s", "purple", state.responses, level=2)
+        
+        consensus_response, votes = state.tally.most_common(1)[0]
+        self.log("[VOTAÇÃO] Contagem: %s", "purple", state.tally, level=2)
+        self.log("[CONSENSO] Round %s: Resposta = %s (votos: %s)", "purple", round_num, consensus_response, votes)
+        return consensus_response
+
+    def start_election_async(self):
+        # A eleição bloqueia por até BULLY_TIMEOUT, então roda fora do scheduler. Uma thread
+        # por vez: uma rajada de ELECTION/ELECT_HIGH não cria threads que só retornariam
+        if self.in_election or not self.election_spawn.acquire(blocking=False):
+            return
+        threading.Thread(target=self.election_thread, daemon=True).start()
+
+    def election_thread(self):
+        try:
+            self.start_election()
+        finally:
+            self.election_spawn.release()
 
     def start_election(self):
-        if not self.network.connected:
+        if not self.network.connected or self.in_election:
             return
             
-        with self.state_lock:
+        # Verificação rápida acima sem lock; refeita sob o writer antes de marcar a eleição
+        with self.election_lock.writer:
             if self.in_election:
                 return
                 
@@ -141,64 +455,103 @@ class Node:
             self.received_ok = False
             
         self.log("Iniciando eleição", "red")
-        bully(self)
+        started = monotonic()
+        if not probe_highest(self):
+            bully(self)
         
-        with self.state_lock:
+        with self.election_lock.writer:
             if self.leader != self.pid:
                 self.in_election = False
+        self.state_changed.set()
+        
+        elapsed = monotonic() - started
+        self.elections += 1
+        self.election_time += elapsed
+        self.log("[ELEIÇÃO] Concluída em %.0f ms (%s eleições, média %.0f ms)", "yellow",
+                 elapsed * 1000, self.elections, self.election_time * 1000 / self.elections)
+
+    def send_hello(self):
+        self.send_probe(self.hello_packet, "HELLO_ACK")
+
+    def send_probe(self, data: bytes, reply: str):
+        # Pares pedido/resposta imediatos medem o RTT: HELLO/HELLO_ACK ao entrar,
+        # ELECTION/OK em cada eleição e ROUND_REQUEST/ROUND_RESPONSE em cada liderança.
+        # O pedido não espera TX_BATCH_DELAY na fila (a espera entraria na amostra):
+        # sai já, junto com o que estiver pendente, e o instante é tomado no envio.
+        if not self.network.connected:
+            return False
+            
+        with self.tx_lock:
+            self.tx_queue.append(data)
+        self.rtt_probes[reply] = monotonic()
+        return self.flush_tx()
+
+    def sample_rtt(self, reply: str, delay: float = 0.0):
+        # Só a primeira resposta a cada pedido vira amostra; delay desconta esperas do outro lado
+        sent = self.rtt_probes.pop(reply, None)
+        if sent is not None:
+            self.record_rtt(monotonic() - sent - delay)
+
+    def record_rtt(self, sample: float):
+        # Média móvel exponencial, como o SRTT do TCP; a primeira amostra vira a média
+        sample = max(sample, 0.0)
+        self.rtt = sample if not self.rtt else self.rtt + RTT_EWMA_ALPHA * (sample - self.rtt)
+
+    def jittered(self, delay: float) -> float:
+        # Processos que reagem ao mesmo evento (queda do líder, mesmo ELECTION) não
+        # disparam a eleição todos no mesmo instante
+        return delay * (1 + uniform(-ELECTION_JITTER, ELECTION_JITTER))
+
+    def rtt_timeout(self, floor: float, factor: float) -> float:
+        # Em LAN o RTT é desprezível e vale o valor do config; em redes lentas o
+        # timeout cresce com o RTT em vez de disparar eleições espúrias. Sem amostra, o config.
+        if not self.rtt:
+            return floor
+        return max(floor, factor * self.rtt)
 
     def start_round_consensus(self):
-        with self.state_lock:
-            if self.pid != self.leader:
-                return
+        if self.pid != self.leader:
+            return
                 
-            self.round_votes = {self.pid: self.round}
-            alive_pids = self.get_alive_pids()
-            
-            self.log(f"[LÍDER] Iniciando consenso de round - processos vivos: {alive_pids}", "green")
-            
-            self.send("ROUND_REQUEST", from_pid=self.pid)
+        alive_pids = self.get_alive_pids()
+        # Troca o dicionário inteiro (atribuição atômica): votos atrasados vão para o antigo
+        self.round_votes = {self.pid: self.round}
+        self.log("[LÍDER] Iniciando consenso de round - processos vivos: %s", "green", alive_pids)
+        self.send_probe(self.round_request_packet, "ROUND_RESPONSE")
             
-        self.round_consensus_timer = threading.Timer(
-            ROUND_CONSENSUS_TIMEOUT, 
-            lambda: self.process_round_consensus()
-        )
-        self.round_consensus_timer.start()
+        self.round_consensus_timer = self.scheduler.schedule(ROUND_CONSENSUS_TIMEOUT, self.process_round_consensus)
     
     def process_round_consensus(self):
-        with self.state_lock:
-            if self.pid != self.leader:
-                return
-                
-            if not self.round_votes:
-                self.log("[CONSENSO ROUND] Nenhum voto recebido, mantendo round atual", "yellow")
-                return
+        if self.pid != self.leader:
+            return
                 
-            round_counts = defaultdict(int)
-            for pid, round_vote in self.round_votes.items():
-                round_counts[round_vote] += 1
-            
-            consensus_round = max(round_counts.items(), key=lambda x: x[1])[0]
+        # list() sobre a view roda em C sem soltar o GIL: cópia consistente sem lock
+        round_votes = list(self.round_votes.values())
+        if not round_votes:
+            self.log("[CONSENSO ROUND] Nenhum voto recebido, mantendo round atual", "yellow")
+            return
             
-            self.log(f"[CONSENSO ROUND] Votos recebidos: {dict(self.round_votes)}", "purple")
-            self.log(f"[CONSENSO ROUND] Contagem: {dict(round_counts)}", "purple") 
-            self.log(f"[CONSENSO ROUND] Round escolhido por maioria: {consensus_round} (votos: {round_counts[consensus_round]})", "green")
+        consensus_round, votes = majority(round_votes)
+        
+        with self.consensus_lock:
+            self.log("[CONSENSO ROUND] Votos recebidos: %s", "purple", self.round_votes, level=2)
+            self.log("[CONSENSO ROUND] Round escolhido por maioria: %s (votos: %s)", "green", consensus_round, votes)
             
             if self.round != consensus_round:
                 old_round = self.round
                 self.round = consensus_round
-                self.log(f"[CONSENSO ROUND] Líder atualizando round de {old_round} para {self.round}", "green")
+                self.log("[CONSENSO ROUND] Líder atualizando round de %s para %s", "green", old_round, self.round)
                 
                 self.send("ROUND_UPDATE", round=self.round)
-                self.log(f"[CONSENSO ROUND] Enviado ROUND_UPDATE para sincronizar todos no round {self.round}", "green")
+                self.log("[CONSENSO ROUND] Enviado ROUND_UPDATE para sincronizar todos no round %s", "green", self.round)
             else:
-                self.log(f"[CONSENSO ROUND] Round já está correto: {self.round}", "green")
+                self.log("[CONSENSO ROUND] Round já está correto: %s", "green", self.round)
 
     def become_leader(self):
         if not self.network.connected:
             return
             
-        with self.state_lock:
+        with self.election_lock.writer:
             if self.leader == self.pid:
                 return
                 
@@ -211,252 +564,371 @@ class Node:
                 self.consensus_timer = None
             
             initial_round = self.round
-            self.log(f"Assumindo liderança com round inicial {initial_round}", "green")
+            self.log("Assumindo liderança com round inicial %s", "green", initial_round)
             
             self.send("LEADER", pid=self.pid, round=initial_round)
+        self.state_changed.set()
             
-        threading.Timer(LEADER_STARTUP_DELAY, self.start_round_consensus).start()
+        self.scheduler.schedule(LEADER_STARTUP_DELAY, self.start_round_consensus)
         
-        threading.Timer(LEADER_STARTUP_DELAY + ROUND_CONSENSUS_TIMEOUT + 0.5, 
-                       self.start_consensus_round).start()
+        # Único agendamento periódico do líder: cada round reagenda o próximo em consensus_timer
+        self.consensus_timer = self.scheduler.schedule(LEADER_STARTUP_DELAY + ROUND_CONSENSUS_TIMEOUT + 0.5,
+                                                       self.start_consensus_round)
 
-    def handle(self, data: bytes):
+    def handle(self, data: bytes, addr: tuple | None = None, deadline: float | None = None):
+        # HB é a maior parte do tráfego: testado antes de tudo pelo primeiro byte e pelo
+        # tamanho, e só o pid é lido. HB é sempre broadcast, então dispensa o filtro de "to".
+        if data[:1] == HB_TAG and len(data) >= HB_FORMAT.size:
+            pid = HB_FORMAT.unpack_from(data)[2]
+            if addr:
+                self.network.learn(pid, addr)
+            self.mark_alive(pid, deadline)
+            return
+            
+        if not well_formed(data):
+            return
+            
+        # Descarta mensagens endereçadas a outro processo antes de decodificar
+        to = recipient(data)
+        if to is not None and to != self.pid:
+            return
+            
+        code = data[0]
+        if code == BATCH_CODE:
+            for packet in split_batch(data):
+                self.handle(packet, addr, deadline)
+            return
+            
         msg = unpack(data)
-        op = msg["op"]
+        if addr and msg.pid is not None:
+            # Aprende o endereço unicast do remetente (HELLO, HB, ...)
+            self.network.learn(msg.pid, addr)
+            
+        self.handlers[code](msg)
+
+    def on_hello(self, msg):
+        sender_pid = msg.pid
+        is_new = self.mark_alive(sender_pid)
+
+        if is_new:
+            self.log("[HELLO] Novo processo descoberto: %s", "green", sender_pid)
+        elif self.verbose:
+            self.log("[HELLO] Recebido de processo %s", "yellow", sender_pid, level=2)
 
-        if op == "HELLO":
-            sender_pid = msg["pid"]
-            is_new = sender_pid not in self.alive
-            self.alive[sender_pid] = monotonic()
+        if self.pid == self.leader and self.network.connected:
+            # HELLOs de processos subindo juntos são respondidos em um único datagrama
+            with self.tx_lock:
+                first = not self.pending_acks
+                self.pending_acks.add(sender_pid)
+            if first:
+                self.scheduler.schedule(HELLO_ACK_DELAY, self.flush_acks)
+
+    def flush_acks(self):
+        with self.tx_lock:
+            pids, self.pending_acks = sorted(self.pending_acks), set()
+        if not pids or self.pid != self.leader:
+            return
             
-            if is_new:
-                self.log(f"[HELLO] Novo processo descoberto: {sender_pid}", "green")
-            else:
-                self.log(f"[HELLO] Recebido de processo {sender_pid}", "yellow")
+        round_num = self.round
+        if len(pids) == 1:
+            self.send("HELLO_ACK", pid=self.pid, round=round_num, to=pids[0])
+        else:
+            # BATCH por multicast; cada HELLO_ACK mantém seu "to" e os demais o descartam
+            self.send_batch(*(("HELLO_ACK", dict(pid=self.pid, round=round_num, to=pid)) for pid in pids))
+        self.log("[HELLO_ACK] Enviado para processos %s (round %s)", "green", pids, round_num)
+
+    def on_hello_ack(self, msg):
+        # Amostra de RTT do último HELLO, sem a janela de agrupamento do líder
+        self.sample_rtt("HELLO_ACK", HELLO_ACK_DELAY)
+        
+        with self.election_lock.writer, self.consensus_lock:
+            self.in_election = False
+            self.leader = msg.pid
+            old_round = self.round
+            self.round = msg.round
+
+            if old_round != self.round:
+                discarded = self.discard_rounds_before(self.round)
+                self.log("[HELLO_ACK] Limpei estados de %s rounds antigos", "yellow", discarded)
+
+        self.state_changed.set()
+        self.mark_alive(msg.pid)
+
+        self.log("Conectado ao líder %s, round %s", "green", self.leader, self.round)
+
+    def on_election(self, msg):
+        src = msg.source
+        if self.pid > src:
+            self.log("[ELECTION] Recebido de %s - sou maior, enviando OK", "yellow", src)
+            self.send("OK", to=src)
+            self.scheduler.schedule(self.jittered(ELECTION_START_DELAY), self.start_election_async)
+        elif self.pid < src:
+            self.election_seen = monotonic()
+            self.log("[ELECTION] Recebido de %s - sou menor, ignorando", "blue", src)
+
+    def on_elect_high(self, msg):
+        self.log("[ELECT_HIGH] Processo %s pediu que eu conduza a eleição", "yellow", msg.from_pid)
+        self.start_election_async()
+
+    def on_ok(self, msg):
+        self.log("[OK] Recebido na eleição", "green")
+        self.sample_rtt("OK")
+        # Escrita única e sem leitura prévia: dispensa o lock
+        self.received_ok = True
+        if self.leader != self.pid:
+            return
             
-            if self.pid == self.leader and self.network.connected:
-                self.send("HELLO_ACK", pid=self.pid, round=self.round, to=sender_pid)
-                self.log(f"[HELLO_ACK] Enviado para processo {sender_pid} (round {self.round})", "green")
+        # Ler e depois limpar o líder é composto: confere de novo sob o writer
+        with self.election_lock.writer:
+            if self.leader == self.pid:
+                self.leader = None
+        self.state_changed.set()
 
-        elif op == "HELLO_ACK":
-            if self.pid == msg["to"]:
-                with self.state_lock:
-                    self.in_election = False
-                    self.leader = msg["pid"]
-                    old_round = self.round
-                    self.round = msg["round"]
-                    self.alive[msg["pid"]] = monotonic()
-                    
-                    if old_round != self.round:
-                        rounds_to_remove = [r for r in self.values_received.keys() if r != self.round]
-                        for r in rounds_to_remove:
-                            self.values_received.pop(r, None)
-                            self.responses_received.pop(r, None)
-                            self.responses_sent.pop(r, None)
-                            
-                            if r in self.value_timers:
-                                self.value_timers[r].cancel()
-                                self.value_timers.pop(r, None)
-                                
-                        self.log(f"[HELLO_ACK] Limpei estados de {len(rounds_to_remove)} rounds diferentes", "yellow")
-                
-                self.log(f"Conectado ao líder {self.leader}, round {self.round}", "green")
-
-        elif op == "HB":
-            self.alive[msg["pid"]] = monotonic()
-
-        elif op == "ELECTION":
-            src = msg["source"]
-            if self.pid > src:
-                self.log(f"[ELECTION] Recebido de {src} - sou maior, enviando OK", "yellow")
-                self.send("OK", to=src)
-                threading.Timer(ELECTION_START_DELAY, self.start_election).start()
-            elif self.pid < src:
-                self.log(f"[ELECTION] Recebido de {src} - sou menor, ignorando", "blue")
-
-        elif op == "OK":
-            if msg.get("to") == self.pid:
-                self.log(f"[OK] Recebido na eleição", "green")
-                self.received_ok = True
-                if self.leader == self.pid:
-                    self.leader = None
+    def on_leader(self, msg):
+        leader_pid = msg.pid
+
+        with self.election_lock.writer:
+            self.in_election = False
+            self.leader = leader_pid
+
+        self.state_changed.set()
+        self.mark_alive(leader_pid)
+
+        with self.consensus_lock:
+            new_round = msg.round if msg.round is not None else self.round
+            if new_round > self.round:
+                self.round = new_round
+                self.log("Líder eleito: %s, sincronizando para round %s", "green", self.leader, self.round)
+            else:
+                self.log("Líder eleito: %s, mantendo round %s", "green", self.leader, self.round)
+
+    def on_start_consensus(self, msg):
+        consensus_round = msg.round
+        self.log("[CONSENSO] Líder iniciou round %s", "cyan", consensus_round)
 
-        elif op == "LEADER":
-            leader_pid = msg["pid"]
-            new_round = msg.get("round", self.round)
+        with self.consensus_lock:
+            if not self.round_in_window(consensus_round):
+                self.log("[CONSENSO] Ignorando round %s fora da janela (round atual %s)", "yellow", consensus_round, self.round)
+                return
+
+            if consensus_round <= self.round:
+                for r, other in self.rounds.items():
+                    if r > consensus_round:
+                        with other.lock:
+                            if other.response_sent is None:
+                                continue
+                            other.response_sent = None
+                        self.log("[CONSENSO] Limpando estado futuro do round %s", "yellow", r)
+
+            state = self.round_state(consensus_round)
+            my_value = self.calculate_current_value()
+
+        with state.lock:
+            if state.response_sent is not None:
+                self.log("[CONSENSO] Limpando resposta anterior do round %s", "yellow", consensus_round)
+                state.response_sent = None
+
+            state.cancel_timer()
+            state.reset_values(self.pid, my_value)
+            state.timer = self.scheduler.schedule(START_CONSENSUS_DELAY, self.process_maximum_value, consensus_round)
+
+        self.log("[CONSENSO] Meu valor gerado: %s (round %s)", "cyan", my_value, consensus_round)
+        self.send("VALUE", pid=self.pid, value=my_value, round=consensus_round)
+
+    def on_resend(self, msg):
+        round_num = msg.round
+        
+        with self.consensus_lock:
+            state = self.rounds.get(round_num)
             
-            with self.state_lock:
-                self.in_election = False
-                self.leader = leader_pid
-                self.alive[leader_pid] = monotonic()
-                
-                if new_round > self.round:
-                    self.round = new_round
-                    self.log(f"Líder eleito: {self.leader}, sincronizando para round {self.round}", "green")
-                else:
-                    self.log(f"Líder eleito: {self.leader}, mantendo round {self.round}", "green")
+        my_value = response = None
+        if state:
+            with state.lock:
+                my_value = state.values.get(self.pid)
+                response = state.response_sent
+            
+        # Nunca participou do round: entra nele como se fosse o START_CONSENSUS perdido
+        if my_value is None:
+            self.on_start_consensus(msg)
+            return
+            
+        # Reenvio idêntico: quem já recebeu descarta pelo estado do round (on_value/on_response)
+        if response is not None and self.pid != self.leader:
+            self.send_batch(("VALUE", dict(pid=self.pid, value=my_value, round=round_num)),
+                            ("RESPONSE", dict(pid=self.pid, response=response, round=round_num)))
+        else:
+            self.send("VALUE", pid=self.pid, value=my_value, round=round_num)
 
-        elif op == "START_CONSENSUS":
-            consensus_round = msg["round"]
-            self.log(f"[CONSENSO] Líder iniciou round {consensus_round}", "cyan")
+    def on_value(self, msg):
+        round_num = msg.round
+        sender_pid = msg.pid
+        value = msg.value
+
+        state = self.window_state(round_num)
+        if state is None:
+            return
             
-            with self.state_lock:
-                if consensus_round in self.responses_sent:
-                    self.log(f"[CONSENSO] Limpando resposta anterior do round {consensus_round}", "yellow")
-                    self.responses_sent.pop(consensus_round, None)
-                
-                if consensus_round <= self.round:
-                    rounds_to_clear = [r for r in self.responses_sent.keys() if r >= consensus_round]
-                    for r in rounds_to_clear:
-                        self.responses_sent.pop(r, None)
-                        self.log(f"[CONSENSO] Limpando estado futuro do round {r}", "yellow")
-                
-                if consensus_round in self.value_timers:
-                    self.value_timers[consensus_round].cancel()
-                    self.value_timers.pop(consensus_round, None)
-                
-                self.values_received[consensus_round] = {}
-                
-                my_value = self.calculate_current_value()
-                self.values_received[consensus_round][self.pid] = my_value
-                self.log(f"[CONSENSO] Meu valor gerado: {my_value} (round {consensus_round})", "cyan")
-                self.send("VALUE", pid=self.pid, value=my_value, round=consensus_round)
+        with state.lock:
+            # Cópia (ex.: reenvio) do mesmo VALUE nesta instância do round. A deduplicação
+            # fica no RoundState, e não nos bytes: um round reiniciado começa vazio e aceita
+            # de novo um valor igual ao da execução anterior.
+            if state.values.get(sender_pid) == value:
+                return
+            is_new = sender_pid not in state.values
+            if is_new and len(state.values) >= MAX_PEERS:
+                return
+
+            state.record_value(sender_pid, value)
+            if self.verbose:
+                self.log("[VALUE] Recebido valor %s do processo %s (round %s)", "purple", value, sender_pid, round_num, level=2)
+
+            # Depois da resposta enviada não há o que reprocessar
+            if state.response_sent is not None:
+                return
                 
-                timer = threading.Timer(START_CONSENSUS_DELAY, lambda: self.process_maximum_value(consensus_round))
-                timer.start()
-                self.value_timers[consensus_round] = timer
-
-        elif op == "VALUE":
-            round_num = msg["round"]
-            sender_pid = msg["pid"]
-            value = msg["value"]
-            
-            with self.state_lock:
-                if round_num not in self.values_received:
-                    self.values_received[round_num] = {}
+            # Todos os vivos já mandaram valor: processa sem esperar o atraso. Comparar os
+            # tamanhos (O(1)) descarta os N-1 primeiros VALUEs; só então a view de chaves
+            # é comparada com o set, sem montar conjuntos intermediários.
+            if is_new and len(state.values) >= len(self.alive) and state.values.keys() >= self.alive:
+                state.cancel_timer()
+                state.timer = self.scheduler.schedule(0, self.process_maximum_value, round_num)
+            elif state.timer is None:
+                # Um único processamento pendente por round
+                state.timer = self.scheduler.schedule(VALUE_PROCESS_DELAY, self.process_maximum_value, round_num)
+
+    def on_response(self, msg):
+        if self.pid == self.leader:
+            round_num = msg.round
+            sender_pid = msg.pid
+            response = msg.response
+
+            state = self.window_state(round_num)
+            if state is None:
+                return
                 
-                self.values_received[round_num][sender_pid] = value
-                self.log(f"[VALUE] Recebido valor {value} do processo {sender_pid} (round {round_num})", "purple")
+            with state.lock:
+                # Mesma regra do on_value: duplicata só dentro da instância atual do round
+                if state.responses.get(sender_pid) == response:
+                    return
+                if sender_pid not in state.responses and len(state.responses) >= MAX_PEERS:
+                    return
+
+                state.record_response(sender_pid, response)
+                if self.verbose:
+                    self.log("[RESPONSE] Líder recebeu resposta %s do processo %s (round %s)", "purple", response, sender_pid, round_num, level=2)
+                decided = state.decided(len(self.alive))
                 
-                if round_num not in self.value_timers:
-                    timer = threading.Timer(VALUE_PROCESS_DELAY, lambda: self.process_maximum_value(round_num))
-                    timer.start()
-                    self.value_timers[round_num] = timer
-
-        elif op == "RESPONSE":
-            with self.state_lock:
-                if self.pid == self.leader:
-                    round_num = msg["round"]
-                    sender_pid = msg["pid"]
-                    response = msg["response"]
-                    
-                    if round_num not in self.responses_received:
-                        self.responses_received[round_num] = {}
-                        
-                    self.responses_received[round_num][sender_pid] = response
-                    self.log(f"[RESPONSE] Líder recebeu resposta {response} do processo {sender_pid} (round {round_num})", "purple")
-
-        elif op == "ROUND_UPDATE":
-            new_round = msg["round"]
+            if decided:
+                self.process_consensus_responses(round_num)
+
+    def on_round_update(self, msg):
+        new_round = msg.round
+        # O líder já avançou o próprio round ao decidir; a cópia do seu ROUND_UPDATE que volta
+        # pelo multicast chega atrasada (com lotes, fora de ordem) e não pode recuá-lo
+        if self.pid == self.leader:
+            return
+
+        with self.consensus_lock:
             old_round = self.round
             self.round = new_round
-            self.log(f"[ROUND_UPDATE] Atualizando round de {old_round} para {new_round}", "blue")
-            
-            with self.state_lock:
-                rounds_to_clear = [r for r in list(self.responses_sent.keys()) if r < new_round]
-                for r in rounds_to_clear:
-                    self.values_received.pop(r, None)
-                    self.responses_received.pop(r, None) 
-                    self.responses_sent.pop(r, None)
-                    
-                    if r in self.value_timers:
-                        self.value_timers[r].cancel()
-                        self.value_timers.pop(r, None)
-                        
-                if rounds_to_clear:
-                    self.log(f"[ROUND_UPDATE] Limpei estados de {len(rounds_to_clear)} rounds antigos", "blue")
-
-        elif op == "ROUND_REQUEST":
-            from_pid = msg["from_pid"]
-            
-            if self.leader is None:
-                self.log(f"[ROUND_REQUEST] Recebido de {from_pid} mas ainda não há líder", "yellow")
-            elif from_pid == self.leader:
-                self.log(f"[ROUND_REQUEST] Recebido do líder {from_pid}, respondendo com round {self.round}", "cyan")
-                self.send("ROUND_RESPONSE", pid=self.pid, round=self.round, to=from_pid)
-            else:
-                self.log(f"[ROUND_REQUEST] Ignorando pedido de {from_pid} (líder atual é {self.leader})", "yellow")
-            
-        elif op == "ROUND_RESPONSE":
-            if msg.get("to") == self.pid:
-                sender_pid = msg["pid"]
-                sender_round = msg["round"]
-                
-                with self.state_lock:
-                    if hasattr(self, 'round_votes'):
-                        self.round_votes[sender_pid] = sender_round
-                        self.log(f"[ROUND_RESPONSE] Recebido voto: PID {sender_pid} votou round {sender_round}", "yellow")
+            self.log("[ROUND_UPDATE] Atualizando round de %s para %s", "blue", old_round, new_round)
+
+            discarded = self.discard_rounds_before(new_round)
+            if discarded:
+                self.log("[ROUND_UPDATE] Limpei estados de %s rounds antigos", "blue", discarded)
+
+    def on_round_request(self, msg):
+        from_pid = msg.from_pid
+
+        if self.leader is None:
+            self.log("[ROUND_REQUEST] Recebido de %s mas ainda não há líder", "yellow", from_pid)
+        elif from_pid == self.leader:
+            self.log("[ROUND_REQUEST] Recebido do líder %s, respondendo com round %s", "cyan", from_pid, self.round)
+            self.send("ROUND_RESPONSE", pid=self.pid, round=self.round, to=from_pid)
+        else:
+            self.log("[ROUND_REQUEST] Ignorando pedido de %s (líder atual é %s)", "yellow", from_pid, self.leader)
+
+    def on_round_response(self, msg):
+        sender_pid = msg.pid
+        sender_round = msg.round
+
+        # Atribuição única em dict: atômica sob o GIL, dispensa consensus_lock. Como os
+        # estados de round, o número de votantes distintos é limitado por MAX_PEERS
+        self.sample_rtt("ROUND_RESPONSE")
+        votes = self.round_votes
+        if sender_pid not in votes and len(votes) >= MAX_PEERS:
+            return
+        votes[sender_pid] = sender_round
+        if self.verbose:
+            self.log("[ROUND_RESPONSE] Recebido voto: PID %s votou round %s", "yellow", sender_pid, sender_round, level=2)
 
     def process_maximum_value(self, round_num: int):
-        with self.state_lock:
-            if round_num not in self.values_received:
-                self.log(f"[PROCESS_MAX] Round {round_num} não tem valores recebidos", "red")
-                return
+        # O máximo já vem pronto em RoundState.max_value, atualizado a cada VALUE
+        with self.consensus_lock:
+            state = self.rounds.get(round_num)
+        if state is None:
+            self.log("[PROCESS_MAX] Round %s não tem valores recebidos", "red", round_num)
+            return
             
-            if round_num in self.responses_sent:
-                self.log(f"[PROCESS_MAX] Já enviou resposta para round {round_num} (valor: {self.responses_sent[round_num]})", "yellow")
+        with state.lock:
+            if state.response_sent is not None:
+                self.log("[PROCESS_MAX] Já enviou resposta para round %s (valor: %s)", "yellow", round_num, state.response_sent)
                 return
                 
-            values = list(self.values_received[round_num].values())
-            if not values:
+            my_response = state.max_value
+            if my_response is None:
                 return
-                
-            my_response = max(values)
+            self.log("[CÁLCULO] Valores recebidos: %s", "cyan", state.values, level=2)
             
-            values_detail = {pid: val for pid, val in self.values_received[round_num].items()}
-            self.log(f"[CÁLCULO] Valores recebidos: {values_detail}", "cyan")
+            # Mesma seção crítica da leitura: um START_CONSENSUS que reinicie o round
+            # (reset_values) não pode entrar entre o cálculo e o registro da resposta
+            is_leader = self.pid == self.leader
+            state.response_sent = my_response
+            state.timer = None
             
-            self.responses_sent[round_num] = my_response
-            
-            if self.pid == self.leader:
-                if round_num not in self.responses_received:
-                    self.responses_received[round_num] = {}
-                self.responses_received[round_num][self.pid] = my_response
-                self.log(f"[LÍDER] Resposta calculada: {my_response} (round {round_num})", "green")
-            else:
-                self.log(f"[RESPOSTA] Enviando resposta máxima: {my_response} (round {round_num})", "cyan")
-                self.send("RESPONSE", pid=self.pid, response=my_response, round=round_num)
-            
-            self.value_timers.pop(round_num, None)
+            if is_leader:
+                state.record_response(self.pid, my_response)
+                decided = state.decided(len(self.alive))
+                
+        if is_leader:
+            self.log("[LÍDER] Resposta calculada: %s (round %s)", "green", my_response, round_num)
+            if decided:
+                self.process_consensus_responses(round_num)
+        else:
+            self.log("[RESPOSTA] Enviando resposta máxima: %s (round %s)", "cyan", my_response, round_num)
+            self.send("RESPONSE", pid=self.pid, response=my_response, round=round_num)
 
     def run(self):
-        self.log(f"Iniciando processo", "green")
+        self.log("Iniciando processo", "green")
         
         listener = threading.Thread(target=self.listen, daemon=True)
         listener.start()
 
-        sleep(STARTUP_DELAY)
+        self.shutdown.wait(STARTUP_DELAY)
 
         self.log("Procurando líder existente...", "yellow")
-        self.send("HELLO", pid=self.pid)
+        self.send_hello()
         start_heartbeat(self)
         
-        sleep(HELLO_TIMEOUT)
+        # Volta assim que o HELLO_ACK chegar, sem esperar o HELLO_TIMEOUT inteiro
+        self.wait_state_change(HELLO_TIMEOUT)
         
         if self.leader is None:
             self.log("Nenhum líder encontrado após HELLO inicial", "yellow")
         else:
-            self.log(f"Líder {self.leader} encontrado", "green")
+            self.log("Líder %s encontrado", "green", self.leader)
 
         start_monitor(self)
         
         last_status_log = 0
         last_network_log = 0
         last_leader_search = 0
-        while not self.shutdown:
+        while not self.shutdown.is_set():
+            timeout = None
+            now = monotonic()
             if not self.network.connected:
                 if self.was_connected:
-                    with self.state_lock:
+                    with self.election_lock.writer:
                         if self.leader == self.pid:
                             self.log("[REDE] Líder perdeu conexão - limpando estado", "red")
                         self.leader = None
@@ -464,11 +936,10 @@ class Node:
                     
                     last_leader_search = 0
                 
-                now = monotonic()
                 if now - last_network_log > NETWORK_LOG_INTERVAL:
                     self.log("[REDE] Sem conexão - aguardando...", "red")
                     last_network_log = now
-                sleep(NETWORK_RETRY_DELAY)
+                self.wait_state_change(NETWORK_RETRY_DELAY)
                 continue
             
             if not self.was_connected and self.network.connected:
@@ -484,108 +955,126 @@ class Node:
                     self.round_consensus_timer = None
                     self.log("[REDE] Timer de consenso de round cancelado", "yellow")
                 
-                self.leader = None
-                self.in_election = False
-                
-                self.values_received.clear()
-                self.responses_received.clear()
-                self.responses_sent.clear()
-                self.round_votes.clear()
+                with self.election_lock.writer:
+                    self.leader = None
+                    self.in_election = False
                 
-                for timer in self.value_timers.values():
-                    try:
-                        timer.cancel()
-                    except:
-                        pass
-                self.value_timers.clear()
+                with self.consensus_lock:
+                    self.discard_all_rounds()
+                    self.round_votes.clear()
                 
-                self.send("HELLO", pid=self.pid)
+                self.send_hello()
                 
                 last_leader_search = 0
                 
-                sleep(NETWORK_RETRY_DELAY)
+                # Recomeça a iteração (e o relógio) depois de dar tempo ao HELLO_ACK
+                self.was_connected = True
+                self.wait_state_change(NETWORK_RETRY_DELAY)
+                continue
                 
             self.was_connected = self.network.connected
             
-            if self.leader is None and not self.in_election:
-                now = monotonic()
-                
+            # leader e in_election mudam juntos: lidos em par sob o reader
+            with self.election_lock.reader:
+                searching = self.leader is None and not self.in_election
+            if searching:
                 if last_leader_search == 0:
                     last_leader_search = now
+                    # Prazo sorteado por busca: processos que sobem juntos não esgotam a
+                    # busca no mesmo instante, e o primeiro a eleger-se encerra a dos outros
+                    search_timeout = LEADER_SEARCH_TIMEOUT + uniform(0, LEADER_SEARCH_JITTER)
                     self.log("Iniciando busca por líder...", "yellow")
                 
+                # Um processo maior já está em eleição e vai assumir: a busca volta a
+                # contar em vez de disparar uma segunda eleição concorrente
+                last_leader_search = max(last_leader_search, self.election_seen)
                 search_duration = now - last_leader_search
                 
-                if search_duration > LEADER_SEARCH_TIMEOUT:
-                    self.log(f"Timeout na busca por líder ({search_duration:.1f}s) - iniciando eleição", "red")
+                if search_duration > search_timeout:
+                    self.log("Timeout na busca por líder (%.1fs) - iniciando eleição", "red", search_duration)
                     self.start_election()
                     last_leader_search = 0
+                    now = monotonic()  # a eleição bloqueia por alguns segundos
                 else:
-                    remaining = LEADER_SEARCH_TIMEOUT - search_duration
-                    self.log(f"Procurando líder... (timeout em {remaining:.1f}s)", "yellow")
-                    self.send("HELLO", pid=self.pid)
-                    sleep(LEADER_SEARCH_INTERVAL)
+                    remaining = search_timeout - search_duration
+                    self.log("Procurando líder... (timeout em %.1fs)", "yellow", remaining)
+                    self.send_hello()
+                    timeout = min(LEADER_SEARCH_INTERVAL, remaining)
             else:
                 last_leader_search = 0
             
-            now = monotonic()
             if now - last_status_log > STATUS_LOG_INTERVAL:
-                with self.state_lock:
-                    if self.leader == self.pid and self.network.connected:
-                        self.log(f"[LÍDER ATIVO] Round: {self.round}, Processos vivos: {len(self.get_alive_pids())}", "green")
-                    elif self.leader is not None:
-                        self.log(f"[SEGUIDOR] Líder: {self.leader}, Round: {self.round}", "blue")
-                    else:
-                        self.log(f"[SEM LÍDER] Aguardando eleição...", "yellow")
+                leader = self.leader
+                if leader == self.pid and self.network.connected:
+                    self.log("[LÍDER ATIVO] Round: %s, Processos vivos: %s", "green", self.round, len(self.get_alive_pids()))
+                elif leader is not None:
+                    self.log("[SEGUIDOR] Líder: %s, Round: %s", "blue", leader, self.round)
+                else:
+                    self.log("[SEM LÍDER] Aguardando eleição...", "yellow")
                 last_status_log = now
-                
-            sleep(MAIN_LOOP_INTERVAL)
+            
+            # Sem mudança de líder ou de conexão, só há trabalho no próximo log de status
+            if timeout is None:
+                timeout = STATUS_LOG_INTERVAL - (now - last_status_log)
+            self.wait_state_change(timeout)
+
+    def wait_state_change(self, timeout: float):
+        self.state_changed.wait(timeout)
+        self.state_changed.clear()
 
     def listen(self):
-        while not self.shutdown:
-            result = self.network.receive(65535)
-            if result is not None:
-                data, _ = result
-                self.handle(data)
-            else:
-                sleep(LISTEN_TIMEOUT)
+        # Métodos ligados uma vez fora do laço que roda a cada datagrama
+        stopped, receive, handle = self.shutdown.is_set, self.network.receive, self.handle
+        while not stopped():
+            packets = receive()
+            if packets is None:
+                self.shutdown.wait(LISTEN_TIMEOUT)
+                continue
+            # Um relógio por leva de datagramas: os HBs dela ganham o mesmo prazo
+            # (mais cedo no máximo pelo tempo de processar a leva, nunca mais tarde)
+            deadline = monotonic() + FAIL_TIMEOUT
+            for data, addr in packets:
+                # Um datagrama que derrube um handler não pode encerrar a thread de recepção
+                try:
+                    handle(data, addr, deadline)
+                except Exception as e:
+                    self.log("[REDE] Erro ao tratar mensagem de %s (%r): %s", "red", addr, data[:1], e)
 
     def stop(self):
         self.log("Encerrando processo...", "yellow")
-        self.shutdown = True
+        self.shutdown.set()
+        self.state_changed.set()
         
-        if self.consensus_timer:
-            try:
-                self.consensus_timer.cancel()
-            except:
-                pass
-                
-        if self.round_consensus_timer:
-            try:
-                self.round_consensus_timer.cancel()
-            except:
-                pass
-            
-        for timer in self.value_timers.values():
-            try:
-                timer.cancel()
-            except:
-                pass
+        self.scheduler.stop()
         
         if self.network and self.network.connected:
+            self.flush_tx()
             self.network.close()
+        
+        # O flusher vê o shutdown e faz a própria descarga final: espera ele terminar para
+        # não haver dois flush_log ao mesmo tempo, e só então escreve o que sobrou. Com
+        # stdout travado (pipe cheio) ele não termina: o encerramento não espera além do
+        # limite e o que restou no buffer é descartado.
+        self.log_thread.join(LOG_STOP_TIMEOUT)
+        if self.log_thread.is_alive():
+            self.log_buf = []
+            return
+        self.flush_log()
 
 def main():
-    import sys
     ap = argparse.ArgumentParser()
     ap.add_argument("--id", type=int, required=True)
+    # LOG_LEVEL no ambiente vale para todos os nós de um "make run-n" de uma vez
+    ap.add_argument("--log-level", type=int, default=os.environ.get("LOG_LEVEL", LOG_LEVEL))
+    ap.add_argument("--color", action=argparse.BooleanOptionalAction, default=None)
+    ap.add_argument("--seed", type=int, default=os.environ.get("SEED"))
     args = ap.parse_args()
     
     print(f"[INICIO] Iniciando sistema com PID {args.id}")
     
     node = None
     try:
-        node = Node(pid=args.id)
+        node = Node(pid=args.id, log_level=args.log_level, color=args.color, seed=args.seed)
         node.run()
     except KeyboardInterrupt:
         print(f"[SAÍDA] Processo {args.id} interrompido pelo usuário")
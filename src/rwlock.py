@@ -0,0 +1,66 @@
+import threading
+
+class RWLock:
+    """
+    Lock de leitores/escritor com preferência para escritores.
+
+    Uso: `with lock.reader:` para leituras e `with lock.writer:` para
+    escritas. Não é reentrante.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self.reader = _ReadGuard(self)
+        self.writer = _WriteGuard(self)
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+class _ReadGuard:
+    __slots__ = ("_lock",)
+
+    def __init__(self, lock: RWLock):
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire_read()
+
+    def __exit__(self, *exc):
+        self._lock.release_read()
+
+class _WriteGuard:
+    __slots__ = ("_lock",)
+
+    def __init__(self, lock: RWLock):
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire_write()
+
+    def __exit__(self, *exc):
+        self._lock.release_write()
@@ -0,0 +1,86 @@
+import heapq, itertools, threading
+from time import monotonic
+
+class ScheduledTask:
+    __slots__ = ("call",)
+
+    def __init__(self, callback, args: tuple):
+        self.call = (callback, args)
+
+    def cancel(self):
+        # A entrada fica no heap até o prazo, mas já solta o callback e seus
+        # argumentos (ex.: estado de rounds descartados)
+        self.call = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.call is None
+
+class Scheduler:
+    """
+    Executa callbacks agendados em uma única thread, ordenados por deadline.
+
+    Substitui um threading.Timer (uma thread por agendamento) por um heap
+    de deadlines consumido por uma thread daemon. Os callbacks devem ser
+    curtos: um callback bloqueante atrasa todos os seguintes.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._stopped = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def schedule(self, delay: float, callback, *args) -> ScheduledTask:
+        return self.schedule_at(monotonic() + delay, callback, *args)
+
+    def schedule_at(self, when: float, callback, *args) -> ScheduledTask:
+        # when no relógio monotonic(): tarefas periódicas contam do prazo anterior e não acumulam atraso
+        task = ScheduledTask(callback, args)
+        with self._cv:
+            heapq.heappush(self._heap, (when, next(self._seq), task))
+            self._cv.notify()
+        return task
+
+    def stop(self):
+        with self._cv:
+            self._stopped = True
+            self._heap.clear()
+            self._cv.notify()
+
+    def _next_due(self) -> list[ScheduledTask] | None:
+        # Retira de uma vez todas as tarefas vencidas, com uma única aquisição do lock
+        with self._cv:
+            while not self._stopped:
+                if not self._heap:
+                    self._cv.wait()
+                    continue
+                now = monotonic()
+                delay = self._heap[0][0] - now
+                if delay > 0:
+                    self._cv.wait(delay)
+                    continue
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[2])
+                return due
+            return None
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            for task in due:
+                if self._stopped:
+                    return
+                # Lido uma vez: cancel() de outra thread pode zerar call a qualquer momento
+                call = task.call
+                if call is None:
+                    continue
+                callback, args = call
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"[SCHEDULER] Erro em {getattr(callback, '__name__', callback)}: {e}", flush=True)
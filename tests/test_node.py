@@ -0,0 +1,71 @@
+import time
+import unittest
+
+from src.config import HELLO_ACK_DELAY
+from src.message import pack
+from src.node import Node
+
+class RoundUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.node = Node(pid=5, log_level=0, color=False)
+
+    def tearDown(self):
+        self.node.stop()
+
+    def deliver(self, round_num: int):
+        self.node.handle(pack("ROUND_UPDATE", round=round_num))
+
+    def test_leader_ignores_looped_back_updates(self):
+        node = self.node
+        node.leader = node.pid
+        node.round = 3
+        with node.consensus_lock:
+            for round_num in range(1, 5):
+                node.round_state(round_num)
+
+        # Cópias atrasadas e fora de ordem do próprio ROUND_UPDATE (lotes de rounds)
+        self.deliver(2)
+        self.deliver(1)
+
+        self.assertEqual(node.round, 3)
+        self.assertEqual(sorted(node.rounds), [1, 2, 3, 4])
+
+    def test_follower_follows_leader_updates(self):
+        node = self.node
+        node.leader = 9
+        node.round = 3
+        with node.consensus_lock:
+            node.round_state(3)
+
+        self.deliver(2)
+        self.assertEqual(node.round, 2)
+        # O consenso de round do líder pode recuar o round dos seguidores
+        self.deliver(1)
+        self.assertEqual(node.round, 1)
+
+class RttProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.node = Node(pid=5, log_level=0, color=False)
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_probe_skips_tx_batching(self):
+        node = self.node
+        node.send_hello()
+        # Saiu na hora: nada na fila nem envio agendado para daqui a TX_BATCH_DELAY
+        self.assertEqual(node.tx_queue, [])
+        self.assertIsNone(node.tx_task)
+        self.assertIn("HELLO_ACK", node.rtt_probes)
+
+    def test_sample_excludes_ack_delay(self):
+        node = self.node
+        # Pedido enviado há 50 ms; a resposta do líder inclui a janela de agrupamento de acks
+        node.rtt_probes["HELLO_ACK"] = time.monotonic() - 0.05
+        node.handle(pack("HELLO_ACK", pid=9, round=0, to=node.pid))
+
+        self.assertNotIn("HELLO_ACK", node.rtt_probes)
+        self.assertAlmostEqual(node.rtt, 0.05 - HELLO_ACK_DELAY, delta=0.01)
+
+if __name__ == "__main__":
+    unittest.main()